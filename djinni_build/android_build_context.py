@@ -1,18 +1,21 @@
 from .build_context import BuildContext
 from .argparse_enums import Architecture, BuildConfiguration
 from .print_prefixed import print_prefixed
-from conans.client.conan_api import Conan
+from typing import TYPE_CHECKING
 import shutil
 import os
 import sys
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from conans.client.conan_api import Conan
+
 
 class AndroidBuildContext(BuildContext):
     """Build context for Android. This defines the logic for packaging all binaries into one AAR"""
 
     def __init__(self,
-                 conan: Conan,
+                 conan: 'Conan',
                  working_directory: Path,
                  android_target: str,
                  android_target_dir: Path,
@@ -24,46 +27,88 @@ class AndroidBuildContext(BuildContext):
                  conan_user: str,
                  conan_channel: str,
                  android_project_dir: Path,
-                 android_module_name: str):
+                 android_module_name: str,
+                 jobs: int = 1,
+                 artifact_cache: Path | None = None,
+                 compiler_launcher: str | None = None):
         super().__init__(conan, working_directory, build_directory, host_profile, build_profile, architectures,
-                         configuration, conan_user, conan_channel)
+                         configuration, conan_user, conan_channel, jobs=jobs,
+                         artifact_cache=artifact_cache, compiler_launcher=compiler_launcher)
         self.android_project_dir = android_project_dir
         self.android_project_target_dir = self.build_directory / 'package'
         self.android_module_name = android_module_name
+        self.android_module_target_dir = self.android_project_target_dir / android_module_name
+        self.jni_libs_target_dir = self.android_module_target_dir / 'src' / 'main' / 'jniLibs'
         self.android_target = android_target
         self.android_target_dir = android_target_dir
 
+    def _find_artifacts(self, architecture: Architecture, lib_name: str, jar_name: str) -> dict[str, Path]:
+        """looks up the given build artifacts of the architecture with a single read of the output directory. Exits
+        the build if the shared library is missing, a missing jar is only an error for the architecture it is taken
+        from."""
+        artifact_dir = self.build_directory.joinpath(architecture.name, self.android_target_dir)
+        try:
+            with os.scandir(artifact_dir) as entries:
+                artifacts = {entry.name: Path(entry.path) for entry in entries if entry.name in (lib_name, jar_name)}
+        except FileNotFoundError:
+            artifacts = {}
+        if lib_name not in artifacts:
+            print_prefixed(f'`{lib_name}` has not been built for architecture {architecture.name}', file=sys.stderr)
+            exit(2)
+        return artifacts
+
     def install(self):
-        for architecture in self.architectures:
-            self.conan_install(architecture=architecture)
+        self._for_each_arch(self.conan_install)
 
     def conan_create_all(self):
-        for architecture in self.architectures:
-            self.conan_create(architecture=architecture)
+        self._for_each_arch(self.conan_create)
 
     def package(self):
         """copies all resources into the Android Studio project and builds it"""
         print_prefixed('packaging to AAR:')
-        BuildContext._copy_directory(self.android_project_dir, self.android_project_target_dir)
+        # only the gradle outputs of the project & its modules, not source directories that happen to be called 'build'
+        BuildContext._sync_directory(self.android_project_dir, self.android_project_target_dir,
+                                     exclude=('/build/', '/*/build/', '/.gradle/'))
+        lib_name = f'lib{self.android_target}.so'
+        jar_name = f'{self.android_target}.jar'
+        artifacts = {architecture: self._find_artifacts(architecture, lib_name, jar_name)
+                     for architecture in self.architectures}
         for architecture in self.architectures:
-            lib_name = f'lib{self.android_target}.so'
             BuildContext._copy_file(
-                src=self.build_directory / architecture.name / self.android_target_dir / lib_name,
-                dst=self.android_project_target_dir / self.android_module_name / 'src' / 'main' / 'jniLibs' / architecture.value.android / lib_name
+                src=artifacts[architecture][lib_name],
+                dst=self.jni_libs_target_dir.joinpath(architecture.value.android, lib_name)
             )
-        print_prefixed(f'copy `{self.android_target}.jar` to Android Studio Project')
-        jar_name = f'{self.android_target}.jar'
-        BuildContext._copy_file(
-            src=self.build_directory / self.architectures[0].name / self.android_target_dir / jar_name,
-            dst=self.android_project_target_dir / self.android_module_name / 'libs' / jar_name
-        )
+        print_prefixed(f'copy `{jar_name}` to Android Studio Project')
+        jar_file = artifacts[self.architectures[0]].get(jar_name)
+        if jar_file is None:
+            print_prefixed(f'`{jar_name}` has not been built for architecture {self.architectures[0].name}',
+                           file=sys.stderr)
+            exit(2)
+        BuildContext._copy_file(src=jar_file, dst=self.android_module_target_dir.joinpath('libs', jar_name))
         print_prefixed('build Android Studio Project')
-        ret = BuildContext._execute('./gradlew', [f'assemble{self.configuration.value}'],
-                                    working_dir=self.android_project_target_dir)
+        gradle_arguments = ['--parallel', f'--max-workers={os.cpu_count()}', f'assemble{self.configuration.value}']
+        gradle_output = []
+        ret = BuildContext._execute('./gradlew', ['--configuration-cache', *gradle_arguments],
+                                    working_dir=self.android_project_target_dir, prefix_output=True,
+                                    output=gradle_output)
+        if ret != 0 and AndroidBuildContext._configuration_cache_rejected(gradle_output):
+            print_prefixed('retrying without the gradle configuration cache (requires Gradle >= 6.6 and compatible '
+                           'plugins)')
+            ret = BuildContext._execute('./gradlew', gradle_arguments, working_dir=self.android_project_target_dir,
+                                        prefix_output=True)
         if ret != 0:
             print_prefixed('building Android Studio Project has failed', file=sys.stderr)
             exit(2)
         BuildContext._copy_file(
-            src=self.android_project_target_dir / self.android_module_name / 'build' / 'outputs' / 'aar' / f'{self.android_module_name}-{self.configuration.name}.aar',
-            dst=self.android_project_target_dir / f'{self.android_module_name}.aar'
-        )
\ No newline at end of file
+            src=self.android_module_target_dir.joinpath('build', 'outputs', 'aar',
+                                                   f'{self.android_module_name}-{self.configuration.name}.aar'),
+            dst=self.android_project_target_dir / f'{self.android_module_name}.aar',
+            link=False
+        )
+
+    @staticmethod
+    def _configuration_cache_rejected(gradle_output: list[str]) -> bool:
+        """checks if a failed gradle build has failed because of the configuration cache: Gradle < 6.6 does not know
+        the option, newer versions fail if a plugin or build script is not compatible with it."""
+        return any("'--configuration-cache'" in line or 'Configuration cache problems found' in line
+                   for line in gradle_output)
@@ -1,5 +1,5 @@
+from dataclasses import dataclass
 from enum import Enum
-from collections import namedtuple
 
 
 class ArgparseEnum(Enum):
@@ -10,10 +10,10 @@ class ArgparseEnum(Enum):
     @classmethod
     def from_string(cls, string: str):
         """this is required for the enum to work with argparse"""
-        try:
-            return cls[string]
-        except KeyError:
+        member = cls.__members__.get(string)
+        if member is None:
             raise ValueError()
+        return member
 
 
 class BuildConfiguration(ArgparseEnum):
@@ -22,7 +22,13 @@ class BuildConfiguration(ArgparseEnum):
     debug = 'Debug'
 
 
-ArchitectureDetails = namedtuple('ArchitectureName', 'conan android windows bit')
+@dataclass(frozen=True, slots=True)
+class ArchitectureDetails:
+    """names of an architecture on each target platform"""
+    conan: str
+    android: str
+    windows: str
+    bit: str
 
 
 class Architecture(ArgparseEnum):
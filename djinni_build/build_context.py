@@ -1,15 +1,42 @@
 from .argparse_enums import Architecture, BuildConfiguration
-from conans.client.conan_api import Conan, ProfileData
 from .print_prefixed import print_prefixed
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, TypeVar, TYPE_CHECKING
+from functools import cached_property
 from pathlib import Path
+import multiprocessing
+import subprocess
+import threading
+import hashlib
+import fnmatch
+import json
 import shutil
+import uuid
+import sys
 import os
 
+if TYPE_CHECKING:
+    from conans.client.conan_api import Conan
+
+T = TypeVar('T')
+
+_inspected_versions: dict[tuple[Path, int], str] = {}
+
+_process_context = multiprocessing.get_context('fork' if sys.platform == 'linux' else 'spawn')
+_conan_cache_lock = _process_context.Lock()
+
+
+def _share_conan_cache_lock(lock):
+    """initializer of the worker processes, makes all of them use the same lock as the process that started them"""
+    global _conan_cache_lock
+    _conan_cache_lock = lock
+
+
 class BuildContext:
     """Base class for all build contexts. Contains common code that is shared between builds for different
     languages/platforms """
 
-    def __init__(self, conan: Conan,
+    def __init__(self, conan: 'Conan',
                  working_directory: Path,
                  build_directory: Path,
                  host_profile: str | Path,
@@ -18,8 +45,12 @@ class BuildContext:
                  configuration: BuildConfiguration,
                  conan_user: str,
                  conan_channel: str,
-                 env: list[str] = [],
-                 settings: list[str] = []):
+                 env: tuple[str, ...] = (),
+                 settings: tuple[str, ...] = (),
+                 jobs: int = 1,
+                 artifact_cache: Path | None = None,
+                 compiler_launcher: str | None = None):
+        from conans.client.conan_api import ProfileData
         self.conan = conan
         self.working_directory = working_directory
         self.host_profile = host_profile
@@ -30,69 +61,524 @@ class BuildContext:
         self.configuration = configuration
         self.conan_user = conan_user
         self.conan_channel = conan_channel
-        self.env = ['CONAN_RUN_TESTS=False'] + env
-        self.settings = [f'build_type={self.configuration.value}'] + settings
-        self.version = self.conan.inspect(path=str(self.working_directory), attributes=['version'])['version']
+        self.jobs = jobs
+        self.artifact_cache = artifact_cache
+        self.env = ('CONAN_RUN_TESTS=False', *env)
+        if compiler_launcher:
+            self.env += (f'CMAKE_C_COMPILER_LAUNCHER={compiler_launcher}',
+                         f'CMAKE_CXX_COMPILER_LAUNCHER={compiler_launcher}')
+        self.settings = (f'build_type={self.configuration.value}', *settings)
+        self._profiles_digest = self._hash_profiles()
+
+    @cached_property
+    def version(self) -> str:
+        """the version of the conan recipe. `conan inspect` has to load the conanfile, so it only runs when the version
+        is needed, and only once per process as long as the conanfile is not modified"""
+        conanfile = self.working_directory / 'conanfile.py'
+        key = (conanfile, conanfile.stat().st_mtime_ns)
+        if key not in _inspected_versions:
+            _inspected_versions[key] = self.conan.inspect(path=str(self.working_directory),
+                                                          attributes=['version'])['version']
+        return _inspected_versions[key]
+
+    def __getstate__(self):
+        """the conan API object cannot be pickled. It is dropped when the context is sent to a worker process"""
+        state = self.__dict__.copy()
+        del state['conan']
+        return state
+
+    def __setstate__(self, state):
+        from conans.client.conan_api import Conan
+        self.__dict__.update(state)
+        self.conan = Conan()
+
+    def _for_each_arch(self, fn: Callable[[Architecture], T]) -> list[T]:
+        """calls `fn` for every selected architecture. If more than one job is allowed, the architectures are
+        processed concurrently in worker processes. Processes are used instead of threads, because the conan API
+        changes process wide state (working directory, environment variables) while it is running."""
+        if self.jobs <= 1 or len(self.architectures) <= 1:
+            return [fn(architecture) for architecture in self.architectures]
+        with BuildContext.process_pool(max_workers=min(self.jobs, len(self.architectures))) as executor:
+            return list(executor.map(fn, self.architectures))
+
+    @staticmethod
+    def process_pool(max_workers: int) -> ProcessPoolExecutor:
+        """creates a pool of worker processes for running conan in parallel. On Linux the workers are forked, so they
+        inherit the already imported conan modules. On macOS and Windows forking is not safe, the workers are spawned.
+        All workers share one lock for the steps that write the same entries into the local conan cache."""
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=_process_context,
+                                   initializer=_share_conan_cache_lock, initargs=(_conan_cache_lock,))
 
     def build(self):
         """builds all selected architectures"""
-        for architecture in self.architectures:
-            print_prefixed(f'building for architecture {architecture.name}:')
-            self.conan.build(conanfile_path=str(self.working_directory),
-                             build_folder=str(self.build_directory / architecture.name))
-
-    def conan_install(self, architecture: Architecture, settings: list[str] = [],
-                      env: list[str] = []):
-        """installs all conan dependencies defined in conanfile.py"""
+        self._for_each_arch(self.conan_build)
+
+    def conan_build(self, architecture: Architecture):
+        """builds the project for the given architecture. The build is skipped if none of its inputs have changed
+        since the last successful build."""
+        fingerprint_file = self.build_directory / architecture.name / '.build-fingerprint'
+        fingerprint = self._fingerprint(architecture)
+        if fingerprint_file.exists() and fingerprint_file.read_text() == fingerprint:
+            print_prefixed(f'architecture {architecture.name} is up to date, skipping build')
+            return
+        build_folder = self.build_directory / architecture.name
+        cache_key = self._artifact_cache_key(architecture) if self.artifact_cache else None
+        if cache_key and (self.artifact_cache / cache_key).exists():
+            print_prefixed(f'restoring architecture {architecture.name} from the artifact cache')
+            BuildContext._copy_directory(self.artifact_cache / cache_key, build_folder)
+            fingerprint_file.write_text(fingerprint)
+            return
+        print_prefixed(f'building for architecture {architecture.name}:')
+        self.conan.build(conanfile_path=str(self.working_directory),
+                         build_folder=str(build_folder))
+        fingerprint_file.write_text(fingerprint)
+        if cache_key:
+            self._store_artifacts(build_folder, cache_key)
+
+    def _store_artifacts(self, build_folder: Path, cache_key: str):
+        """copies the build folder into the artifact cache. The copy is staged under a temporary name and renamed when
+        complete, so that a cache entry is never visible half written, even if other builds store the same key."""
+        staging_directory = self.artifact_cache / f'{cache_key}.{os.getpid()}.tmp'
+        BuildContext._copy_directory(build_folder, staging_directory)
+        try:
+            staging_directory.rename(self.artifact_cache / cache_key)
+        except OSError:
+            BuildContext._remove_tree(staging_directory)
+
+    def _artifact_cache_key(self, architecture: Architecture) -> str | None:
+        """hashes the content of all build inputs for the given architecture: the git tree of the sources, the conan
+        profiles, settings, environment, the resolved dependencies and the build folder path (CMake stores absolute
+        paths). Returns None if the sources are not a clean git checkout, because their content is unknown then."""
+        if self._source_tree is None:
+            return None
+        key = hashlib.blake2b(digest_size=16)
+        key.update(self._profiles_digest)
+        build_folder = (self.build_directory / architecture.name).resolve()
+        key.update(f'{self._source_tree};{architecture.value.conan};{self.settings};{self.env};{build_folder}'.encode())
+        key.update(f"{os.environ.get('CC', '')};{os.environ.get('CXX', '')}".encode())
+        lockfile = build_folder / 'conan.lock'
+        if lockfile.exists():
+            key.update(lockfile.read_bytes())
+        return key.hexdigest()
+
+    @cached_property
+    def _source_tree(self) -> str | None:
+        """the git tree hash of the working directory, or None if it is not a git checkout or has local changes"""
+        try:
+            status = subprocess.run(['git', 'status', '--porcelain'], cwd=self.working_directory,
+                                    capture_output=True, text=True)
+            tree = subprocess.run(['git', 'rev-parse', 'HEAD^{tree}'], cwd=self.working_directory,
+                                  capture_output=True, text=True)
+        except OSError:
+            return None
+        if status.returncode != 0 or status.stdout or tree.returncode != 0:
+            return None
+        return tree.stdout.strip()
+
+    def _fingerprint(self, architecture: Architecture) -> str:
+        """hashes every input that can influence the build output for the given architecture: the conan profiles,
+        settings and environment, the installed dependencies and path, size & modification time of all project
+        files (see `_project_files`)."""
+        fingerprint = hashlib.blake2b(digest_size=16)
+        fingerprint.update(self._profiles_digest)
+        fingerprint.update(f'{architecture.value.conan};{self.settings};{self.env}'.encode())
+        conaninfo = self.build_directory / architecture.name / 'conaninfo.txt'
+        if conaninfo.exists():
+            fingerprint.update(conaninfo.read_bytes())
+        self._hash_files(fingerprint, self._project_files())
+        return fingerprint.hexdigest()
+
+    def _hash_files(self, digest: 'hashlib.blake2b', files: list[Path]):
+        """adds path, size & modification time of the given project files to `digest`. Files that no longer exist
+        are left out."""
+        for file in files:
+            try:
+                stat = (self.working_directory / file).lstat()
+            except FileNotFoundError:
+                continue
+            digest.update(f'{file.as_posix()};{stat.st_size};{stat.st_mtime_ns}'.encode())
+
+    def _project_files(self) -> list[Path]:
+        """lists the source files of the project relative to the working directory: the files tracked by git and
+        untracked files that are not ignored, or all files if the project is not a git checkout. Hidden files and
+        outputs that are written into the source tree are never included: the build directory and the folders in
+        which `conan create` builds the test package (`test_package/build`)."""
+        working_directory = self.working_directory.resolve()
+        excluded = [Path('test_package') / 'build']
+        build_directory = self.build_directory.resolve()
+        if build_directory.is_relative_to(working_directory) and build_directory != working_directory:
+            # the build directory of each platform is a subdirectory of the one given on the command line
+            excluded.append(Path(build_directory.relative_to(working_directory).parts[0]))
+
+        def is_input(path: Path) -> bool:
+            return not any(part.startswith('.') for part in path.parts) and \
+                not any(path.is_relative_to(directory) for directory in excluded)
+
+        def walk(directory: Path) -> list[Path]:
+            files = []
+            for root, directories, names in os.walk(working_directory / directory):
+                relative_root = Path(root).relative_to(working_directory)
+                directories[:] = [name for name in directories if is_input(relative_root / name)]
+                files += [relative_root / name for name in names if is_input(relative_root / name)]
+            return files
+
+        try:
+            listing = subprocess.run(['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard'],
+                                     cwd=working_directory, capture_output=True)
+        except OSError:
+            listing = None
+        if listing is None or listing.returncode != 0:
+            return sorted(walk(Path()))
+        files = []
+        for name in listing.stdout.decode(errors='surrogateescape').split('\0'):
+            path = Path(name)
+            if not name or not is_input(path):
+                continue
+            # git lists submodules as a single entry, their files are listed by walking them
+            files += walk(path) if (working_directory / path).is_dir() else [path]
+        return sorted(files)
+
+    def conan_install(self, architecture: Architecture, settings: tuple[str, ...] = (),
+                      env: tuple[str, ...] = ()):
+        """installs all conan dependencies defined in conanfile.py. The resolved dependency graph is stored in
+        `conan.lock` in the install folder."""
+        all_settings = (*settings, *self.settings, f"arch={architecture.value.conan}")
+        all_env = (*env, *self.env)
+        install_folder = self.build_directory / architecture.name
+        stamp_file = install_folder / '.install-stamp'
+        if stamp_file.exists() and stamp_file.read_text() == self._install_stamp(install_folder, all_settings, all_env):
+            if self._dependencies_in_cache(install_folder):
+                print_prefixed(f'dependencies for architecture {architecture.name} are up to date, skipping install')
+                return
+            print_prefixed(f'dependencies for architecture {architecture.name} are missing in the local conan cache')
         print_prefixed(f'installing dependencies for architecture {architecture.name}:')
-        all_settings = settings + self.settings + [f"arch={architecture.value.conan}"]
-        all_env = env + self.env
-        self.conan.install(install_folder=str(self.build_directory / architecture.name),
+        self.conan.install(install_folder=str(install_folder),
                            profile_names=[str(self.host_profile)],
                            profile_build=self.build_profile,
                            build=["missing"],
                            settings=all_settings,
-                           env=all_env)
+                           env=all_env,
+                           lockfile_out=str(install_folder / 'conan.lock'))
+        stamp_file.write_text(self._install_stamp(install_folder, all_settings, all_env))
+
+    def _install_stamp(self, install_folder: Path, settings: tuple[str, ...], env: tuple[str, ...]) -> str:
+        """hashes all inputs of `conan install`: the conan profiles, settings, environment, the conanfile with its
+        conandata.yml and python_requires, and the dependency graph that was resolved by the last install into
+        `install_folder`."""
+        stamp = hashlib.blake2b(digest_size=16)
+        stamp.update(self._profiles_digest)
+        stamp.update(f'{settings};{env}'.encode())
+        stamp.update((self.working_directory / 'conanfile.py').read_bytes())
+        conandata = self.working_directory / 'conandata.yml'
+        if conandata.exists():
+            stamp.update(conandata.read_bytes())
+        lockfile = install_folder / 'conan.lock'
+        if lockfile.exists():
+            stamp.update(lockfile.read_bytes())
+            for python_require in self._locked_python_requires(lockfile):
+                stamp.update(self._recipe_in_cache(python_require).encode())
+        return stamp.hexdigest()
 
-    def conan_create(self, architecture: Architecture, settings: list[str] = [],
-                     env: list[str] = []):
-        """creates the conan package for the current configuration"""
+    @staticmethod
+    def _locked_python_requires(lockfile: Path) -> list[str]:
+        """the python_requires of the consumer conanfile, as locked in `lockfile`"""
+        try:
+            nodes = json.loads(lockfile.read_text())['graph_lock']['nodes']
+        except (OSError, ValueError, KeyError):
+            return []
+        return [python_require for node in nodes.values() if 'path' in node
+                for python_require in node.get('python_requires', [])]
+
+    def _recipe_in_cache(self, reference: str) -> str:
+        """the conanfile of `reference` in the local conan cache, or an empty string if it is not there. Without
+        revisions the lockfile does not change when a python_requires recipe is modified, its content does."""
+        from conans.errors import ConanException
+        try:
+            return self.conan.get_path(reference)[0]
+        except ConanException:
+            return ''
+
+    def _dependencies_in_cache(self, install_folder: Path) -> bool:
+        """checks that the packages of all dependencies locked by the last install into `install_folder` are still in
+        the local conan cache. The files generated by the install point into their package folders."""
+        try:
+            nodes = json.loads((install_folder / 'conan.lock').read_text())['graph_lock']['nodes']
+        except (OSError, ValueError, KeyError):
+            return False
+        # the consumer conanfile itself is referenced by its path and is not in the cache
+        return all(self._package_exists(node['ref'].split('#')[0], node['package_id'])
+                   for node in nodes.values() if node.get('ref') and node.get('package_id') and 'path' not in node)
+
+    def _hash_profiles(self) -> bytes:
+        """hash of the host & build profiles as conan resolves them, including the profiles they include. This runs
+        once in the process that creates the context, the workers receive the digest with the pickled context."""
+        digest = hashlib.blake2b(digest_size=16)
+        for profile in [self.host_profile, *self.build_profile.profiles]:
+            digest.update(self.conan.read_profile(str(profile)).dumps().encode())
+        return digest.digest()
+
+    def conan_create(self, architecture: Architecture, settings: tuple[str, ...] = (),
+                     env: tuple[str, ...] = ()):
+        """creates the conan package for the current configuration. The package is not created again if none of its
+        inputs have changed and the package created last time is still in the local conan cache."""
+        all_settings = (*settings, *self.settings, f"arch={architecture.value.conan}")
+        all_env = (*env, *self.env)
+        stamp_file = self.build_directory / architecture.name / '.create-stamp'
+        inputs = self._create_inputs(architecture, all_settings, all_env)
+        if stamp_file.exists() and self._package_in_cache(stamp_file.read_text(), inputs):
+            print_prefixed(f'conan package for architecture {architecture.name} is up to date, skipping create')
+            return
         print_prefixed(f'creating conan package for architecture {architecture.name}:')
-        all_settings = settings + self.settings + [f"arch={architecture.value.conan}"]
-        all_env = env + self.env
-        self.conan.create(profile_names=[str(self.host_profile)],
-                          profile_build=self.build_profile,
-                          conanfile_path=str(self.working_directory),
-                          settings=all_settings,
-                          user=self.conan_user,
-                          channel=self.conan_channel,
-                          env=all_env)
+        # every architecture exports the same recipe, so the export must not run in multiple processes at once.
+        # Building the package for the architecture is independent and runs outside the lock.
+        with _conan_cache_lock:
+            self.conan.export(str(self.working_directory), None, None, self.conan_user, self.conan_channel)
+        result = self.conan.create(profile_names=[str(self.host_profile)],
+                                   profile_build=self.build_profile,
+                                   conanfile_path=str(self.working_directory),
+                                   settings=all_settings,
+                                   user=self.conan_user,
+                                   channel=self.conan_channel,
+                                   env=all_env,
+                                   not_export=True)
+        for installed in result['installed']:
+            if not installed['recipe']['dependency'] and installed['packages']:
+                reference = installed['recipe']['id'].split('#')[0]
+                stamp_file.write_text(f"{inputs}\n{reference}\n{installed['packages'][0]['id']}")
+
+    def _create_inputs(self, architecture: Architecture, settings: tuple[str, ...], env: tuple[str, ...]) -> str:
+        """hashes all inputs of `conan create` for the given architecture: the exported recipe, the conan profiles,
+        settings, environment, user & channel and the dependencies resolved by the last install."""
+        inputs = hashlib.blake2b(digest_size=16)
+        inputs.update(self._recipe_digest)
+        inputs.update(self._profiles_digest)
+        inputs.update(f'{settings};{env};{self.conan_user};{self.conan_channel}'.encode())
+        lockfile = self.build_directory / architecture.name / 'conan.lock'
+        if lockfile.exists():
+            inputs.update(lockfile.read_bytes())
+        return inputs.hexdigest()
+
+    @cached_property
+    def _recipe_digest(self) -> bytes:
+        """hashes the project files that `conan export` copies into the local conan cache: the conanfile,
+        conandata.yml and the files matching the `exports` & `exports_sources` patterns of the recipe. If the recipe
+        exports files with the `export()`/`export_sources()` methods or with scm, all project files are hashed,
+        because it is unknown which of them are exported."""
+        recipe = self.conan.inspect(path=str(self.working_directory),
+                                    attributes=['exports', 'exports_sources', 'export', 'export_sources', 'scm'])
+        files = self._project_files()
+        if not (recipe['export'] or recipe['export_sources'] or recipe['scm']):
+            files = [file for file in files
+                     if file.as_posix() in ('conanfile.py', 'conandata.yml')
+                     or BuildContext._is_exported(file, recipe['exports'])
+                     or BuildContext._is_exported(file, recipe['exports_sources'])]
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update((self.working_directory / 'conanfile.py').read_bytes())
+        self._hash_files(digest, files)
+        return digest.digest()
+
+    @staticmethod
+    def _is_exported(file: Path, patterns: str | list[str] | tuple[str, ...] | None) -> bool:
+        """checks if the file matches the `exports` or `exports_sources` patterns of a recipe the same way conan does:
+        with fnmatch on the relative path, patterns starting with `!` exclude files."""
+        if not patterns:
+            return False
+        if isinstance(patterns, str):
+            patterns = (patterns,)
+        name = os.path.normpath(file)
+        return any(fnmatch.fnmatch(name, pattern) for pattern in patterns if not pattern.startswith('!')) and \
+            not any(fnmatch.fnmatch(name, pattern[1:]) for pattern in patterns if pattern.startswith('!'))
+
+    def _package_in_cache(self, stamp: str, inputs: str) -> bool:
+        """checks if the stamp written by the last `conan create` was created from the same inputs and the package it
+        recorded can still be found in the local conan cache."""
+        recorded = stamp.split('\n')
+        if len(recorded) != 3 or recorded[0] != inputs:
+            return False
+        _, reference, package_id = recorded
+        return self._package_exists(reference, package_id)
+
+    def _package_exists(self, reference: str, package_id: str) -> bool:
+        """checks if the binary package of the recipe `reference` with the given package ID is in the local conan
+        cache"""
+        from conans.errors import ConanException
+        try:
+            result = self.conan.search_packages(reference)
+        except ConanException:
+            return False
+        return any(package['id'] == package_id
+                   for remote in result['results'] for item in remote['items'] for package in item.get('packages', []))
+
+    @staticmethod
+    def find_compiler_launcher() -> str | None:
+        """looks for a compiler cache that CMake can use as compiler launcher. sccache is preferred on Windows, ccache
+        on all other platforms."""
+        candidates = ['sccache', 'ccache'] if sys.platform == 'win32' else ['ccache', 'sccache']
+        for candidate in candidates:
+            if shutil.which(candidate):
+                return candidate
+        return None
 
     @staticmethod
-    def _copy_directory(src_dir: Path, target_dir: Path, clean: bool = True):
+    def _copy_directory(src_dir: Path, target_dir: Path, clean: bool = True,
+                        copy_function: Callable = shutil.copy2):
         print_prefixed(f"Copy directory '{src_dir}' to '{target_dir}'")
-        if target_dir.exists() and clean:
+        if clean:
+            BuildContext._clean(target_dir)
+        if copy_function is shutil.copy2 and not target_dir.exists() and BuildContext._clone_directory(src_dir, target_dir):
+            return
+        shutil.copytree(src=src_dir, dst=target_dir, symlinks=True, copy_function=copy_function)
+
+    @staticmethod
+    def _sync_directory(src_dir: Path, target_dir: Path, exclude: tuple[str, ...] = ()):
+        """makes `target_dir` a copy of `src_dir` like `_copy_directory`, but uses rsync if it is available to only
+        copy the files that have changed. Files matching one of the rsync `exclude` patterns are kept in `target_dir`,
+        e.g. to preserve the outputs of incremental builds that are run inside of it. Patterns starting with `/` are
+        anchored at `src_dir`."""
+        if shutil.which('rsync') is not None:
+            print_prefixed(f"Sync directory '{src_dir}' to '{target_dir}'")
+            target_dir.mkdir(parents=True, exist_ok=True)
+            arguments = ['-a', '--delete', *[f'--exclude={pattern}' for pattern in exclude], f'{src_dir}/', f'{target_dir}/']
+            if subprocess.run(['rsync', *arguments]).returncode == 0:
+                return
+        BuildContext._copy_directory(src_dir, target_dir)
+
+    @staticmethod
+    def _clone_directory(src_dir: Path, target_dir: Path) -> bool:
+        """clones the directory with copy-on-write if the platform supports it (`clonefile` on APFS, reflinks on btrfs &
+        XFS). The data is only copied when one of the copies is modified. On Linux filesystems without reflinks `cp`
+        copies the data instead, which is still faster than copying in Python. On Windows the directory is copied by
+        robocopy with multiple threads. Returns False if the directory could not be cloned, or if the native tools
+        have been disabled by setting `DJINNI_FAST_COPY=0`."""
+        if os.environ.get('DJINNI_FAST_COPY') == '0':
+            return False
+        if sys.platform == 'darwin':
+            command = ['cp', '-cR', str(src_dir), str(target_dir)]
+        elif sys.platform == 'linux':
+            command = ['cp', '--reflink=auto', '-a', str(src_dir), str(target_dir)]
+        elif sys.platform == 'win32':
+            command = ['robocopy', str(src_dir), str(target_dir), '/E', '/SL', '/MT:16', '/NDL', '/NFL', '/NJH', '/NJS']
+        else:
+            return False
+        target_dir.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            return False
+        # robocopy reports success with exit codes below 8, the other tools with 0
+        succeeded = result.returncode < 8 if sys.platform == 'win32' else result.returncode == 0
+        if not succeeded and target_dir.exists():
             shutil.rmtree(target_dir)
-        shutil.copytree(src=src_dir, dst=target_dir, symlinks=True)
+        return succeeded
 
     @staticmethod
-    def _copy_file(src: Path, dst: Path):
+    def _copy_file(src: Path, dst: Path, link: bool = True):
+        """copies `src` to `dst`, see `_fast_copy`. Pass `link=False` for build outputs that are handed to the user,
+        they must not change when the tool that created `src` rewrites it in place in the next build."""
         print_prefixed(f"Copy file '{src}' to '{dst}'")
         dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy(src, dst)
+        if link:
+            BuildContext._fast_copy(src, dst)
+        else:
+            Path(dst).unlink(missing_ok=True)
+            BuildContext._copy_file_contents(src, dst)
+            shutil.copystat(src, dst)
+
+    @staticmethod
+    def _fast_copy(src: Path | str, dst: Path | str):
+        """hardlinks `src` to `dst` and falls back to copying the file if that is not possible (e.g. when `dst` is on
+        another filesystem). The copy keeps the timestamps of `src` like the hardlink does. Only use this for build
+        artifacts that are not modified in place afterwards."""
+        Path(dst).unlink(missing_ok=True)
+        try:
+            os.link(src, dst)
+        except OSError:
+            BuildContext._copy_file_contents(src, dst)
+            shutil.copystat(src, dst)
+        return dst
+
+    @staticmethod
+    def _copy_file_contents(src: Path | str, dst: Path | str):
+        """copies the content of `src` to `dst` with `copy_file_range` where available (Linux), which lets the
+        filesystem share the data instead of copying it (reflinks on btrfs & XFS, server side copies on NFS). On
+        Windows the file is copied by `CopyFileExW` without going through Python buffers. Falls back to
+        `shutil.copyfile`, which copies in the kernel as well (`sendfile` on Linux, `fcopyfile` on macOS)."""
+        if sys.platform == 'win32':
+            import ctypes
+            if ctypes.windll.kernel32.CopyFileExW(str(src), str(dst), None, None, None, 0):
+                return
+        elif hasattr(os, 'copy_file_range'):
+            try:
+                with open(src, 'rb') as source, open(dst, 'wb') as target:
+                    remaining = os.fstat(source.fileno()).st_size
+                    while remaining > 0:
+                        copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                if remaining == 0:
+                    return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
 
     @staticmethod
     def _clean(directory: Path):
-        """deletes the given directory if it exists"""
-        if directory.exists():
+        """deletes the given directory if it exists. The directory is renamed to a hidden sibling first and deleted in a
+        background thread, so that it can be recreated right away. The interpreter waits for the deletion to finish
+        before it exits."""
+        if not directory.exists():
+            return
+        trash = directory.with_name(f'.trash-{uuid.uuid4().hex}-{directory.name}')
+        try:
+            directory.rename(trash)
+        except OSError:
             shutil.rmtree(directory)
+            return
+        threading.Thread(target=BuildContext._remove_tree, args=(trash,)).start()
+
+    @staticmethod
+    def _remove_tree(directory: Path):
+        """deletes the directory tree. `rm -rf` is used where available, it is considerably faster than
+        `shutil.rmtree` for large trees."""
+        if sys.platform != 'win32':
+            try:
+                if subprocess.run(['rm', '-rf', str(directory)]).returncode == 0:
+                    return
+            except OSError:
+                pass
+        shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def _execute(command: str, arguments: list[str], working_dir: Path | None = None,
+                 prefix_output: bool = False, output: list[str] | None = None) -> int:
+        """runs the command without a shell and waits for it to finish. Every element of `arguments` is passed as a
+        separate argument. The working directory only applies to the child process, the current directory of this
+        process is never changed. With `prefix_output`, every line the command prints is forwarded through
+        `print_prefixed`, so that the output of builds running in parallel stays line by line. The forwarded lines
+        are also appended to `output`, if given."""
+        process = BuildContext._spawn(command, arguments, working_dir, capture_output=prefix_output)
+        if prefix_output:
+            with process.stdout:
+                for line in process.stdout:
+                    print_prefixed(line.rstrip('\n'))
+                    if output is not None:
+                        output.append(line)
+        return process.wait()
 
     @staticmethod
-    def _execute(command: str, arguments: list[str], working_dir: Path = Path(os.getcwd())) -> int:
-        cwd = os.getcwd()
-        os.chdir(working_dir)
-        full_command = f'{command} {" ".join(arguments)}'
-        print_prefixed(f"Executing command '{full_command}'")
-        result = os.system(full_command)
-        os.chdir(cwd)
-        return result
+    def _spawn(command: str, arguments: list[str], working_dir: Path | None = None,
+               capture_output: bool = False) -> subprocess.Popen:
+        """starts the command like `_execute`, but returns without waiting for it to finish. The output of the child
+        process is not captured unless `capture_output` is set, in which case stdout and stderr are merged into one
+        text pipe that the caller has to drain. Exits the build if the command can't be found."""
+        full_command = [command, *arguments]
+        print_prefixed(f"Executing command '{' '.join(full_command)}'")
+        try:
+            return subprocess.Popen(full_command, cwd=working_dir,
+                                    stdout=subprocess.PIPE if capture_output else None,
+                                    stderr=subprocess.STDOUT if capture_output else None,
+                                    bufsize=1 << 16, text=True, errors='replace')
+        except FileNotFoundError:
+            print_prefixed(f"command '{command}' not found", file=sys.stderr)
+            exit(2)
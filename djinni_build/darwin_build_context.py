@@ -1,15 +1,22 @@
 from .build_context import BuildContext
 from .argparse_enums import Architecture, BuildConfiguration
 from .print_prefixed import print_prefixed
-from conans.client.conan_api import Conan
+from typing import TYPE_CHECKING
+from functools import partial, cached_property, cache
 from pathlib import Path
+import subprocess
+import sys
+import os
+
+if TYPE_CHECKING:
+    from conans.client.conan_api import Conan
 
 
 class DarwinBuildContext(BuildContext):
     """Build Context for iOS,macOS. This defines the logic for packaging all binaries into a single XCFramework"""
 
     def __init__(self,
-                 conan: Conan,
+                 conan: 'Conan',
                  working_directory: Path,
                  darwin_target: str,
                  darwin_target_dir: Path,
@@ -20,25 +27,24 @@ class DarwinBuildContext(BuildContext):
                  configuration: BuildConfiguration,
                  sdk: str,
                  conan_user: str,
-                 conan_channel: str):
+                 conan_channel: str,
+                 jobs: int = 1,
+                 artifact_cache: Path | None = None,
+                 compiler_launcher: str | None = None):
         super().__init__(conan, working_directory, build_directory / sdk, host_profile, build_profile, architectures,
-                         configuration, conan_user, conan_channel)
+                         configuration, conan_user, conan_channel, jobs=jobs,
+                         artifact_cache=artifact_cache, compiler_launcher=compiler_launcher)
         self.sdk = sdk
         self.darwin_target = darwin_target
         self.darwin_target_dir = darwin_target_dir
 
     def install(self):
-        for architecture in self.architectures:
-            self.conan_install(architecture=architecture,
-                               settings=[f'os.sdk={self.sdk}'])
+        self._for_each_arch(partial(self.conan_install, settings=(f'os.sdk={self.sdk}',)))
 
     def conan_create_all(self):
-        for architecture in self.architectures:
-            self.conan_create(
-                architecture=architecture,
-                settings=[f'os.sdk={self.sdk}'])
+        self._for_each_arch(partial(self.conan_create, settings=(f'os.sdk={self.sdk}',)))
 
-    @property
+    @cached_property
     def target_folder(self):
         """determines the name of the folder in which the XCode build will output the binaries. The folder name
         differs depending on the target platform."""
@@ -47,7 +53,7 @@ class DarwinBuildContext(BuildContext):
             folder_name = f'{self.configuration.value}-{self.sdk}'
         return folder_name
 
-    @property
+    @cached_property
     def combined_architecture(self):
         """determines the name of a target folder that contains a universal binary targeting multiple architectures.
         This is not the name used inside the XCFramework, it's just used for temporarily storing the generated
@@ -60,41 +66,48 @@ class DarwinBuildContext(BuildContext):
         super().build()
         if len(self.architectures) > 1:
             lipo_dir = self.build_directory / self.combined_architecture
-            self._lipo_combine(lipo_dir, self.darwin_target, self.darwin_target_dir)
-            self._lipo_combine_dsym(lipo_dir, self.darwin_target, self.darwin_target_dir)
-
-    def _lipo_combine(self, lipo_dir: Path, target: str, target_dir: Path):
-        """combines multiple architectures into one multi-architecture framework."""
-        BuildContext._copy_directory(
-            src_dir=self.build_directory / self.architectures[0].value.conan / target_dir / self.target_folder / f'{target}.framework',
-            target_dir=lipo_dir / target_dir / self.target_folder / f'{target}.framework')
-        lipo_input: list[Path] = []
-        if self.sdk == 'macosx':
-            lipo_output: Path = lipo_dir / target_dir / self.target_folder / f'{target}.framework' / 'Versions' / 'A' / target
-        else:
-            lipo_output: Path = lipo_dir / target_dir / self.target_folder / f'{target}.framework' / target
-        for architecture in self.architectures:
-            if self.sdk == 'macosx':
-                lipo_input.append(self.build_directory / architecture.name / target_dir / self.target_folder / f'{target}.framework' / 'Versions' / 'A' / target)
-            else:
-                lipo_input.append(self.build_directory / architecture.name / target_dir / self.target_folder / f'{target}.framework' / target)
-        BuildContext._execute('lipo', [str(x) for x in lipo_input] + ['-create', f'-output {lipo_output}'])
-
-    def _lipo_combine_dsym(self, lipo_dir: Path, target: str, target_dir: Path):
-        """combines dSYM information for multiple architectures into one multi-architecture binary, if available"""
-        dsym_src = self.build_directory / self.architectures[0].value.conan / target_dir / self.target_folder / f'{target}.framework.dSYM'
+            processes = [self._lipo_combine(lipo_dir, self.darwin_target, self.darwin_target_dir),
+                         self._lipo_combine_dsym(lipo_dir, self.darwin_target, self.darwin_target_dir)]
+            for process in processes:
+                if process is not None and process.wait() != 0:
+                    print_prefixed('combining the architectures with lipo has failed', file=sys.stderr)
+                    exit(2)
+
+    def _lipo_combine(self, lipo_dir: Path, target: str, target_dir: Path) -> subprocess.Popen:
+        """combines multiple architectures into one multi-architecture framework. Returns the running lipo process."""
+        framework = target_dir.joinpath(self.target_folder, f'{target}.framework')
+        BuildContext._copy_directory(src_dir=self.build_directory.joinpath(self.architectures[0].name, framework),
+                                     target_dir=lipo_dir / framework)
+        binary = framework.joinpath('Versions', 'A', target) if self.sdk == 'macosx' else framework / target
+        lipo_input = [self.build_directory.joinpath(architecture.name, binary) for architecture in self.architectures]
+        return BuildContext._spawn(DarwinBuildContext._xcode_tool('lipo'),
+                                   [*map(str, lipo_input), '-create', '-output', str(lipo_dir / binary)])
+
+    def _lipo_combine_dsym(self, lipo_dir: Path, target: str, target_dir: Path) -> subprocess.Popen | None:
+        """combines dSYM information for multiple architectures into one multi-architecture binary, if available.
+        Returns the running lipo process."""
+        dsym = target_dir.joinpath(self.target_folder, f'{target}.framework.dSYM')
+        dsym_src = self.build_directory.joinpath(self.architectures[0].name, dsym)
         if dsym_src.exists():
             print_prefixed(f'found debug symbols (dSYM). Combining with lipo...')
-            BuildContext._copy_directory(
-                src_dir=dsym_src,
-                target_dir=lipo_dir / target_dir / self.target_folder / f'{target}.framework.dSYM'
-            )
-            lipo_input: list[Path] = []
-            lipo_output: Path = lipo_dir / target_dir / self.target_folder / f'{target}.framework.dSYM' / 'Contents' / 'Resources' / 'DWARF' / target
-            for architecture in self.architectures:
-                lipo_input.append(
-                    self.build_directory / architecture.name / target_dir / self.target_folder / f'{target}.framework.dSYM' / 'Contents' / 'Resources' / 'DWARF' / target)
-            BuildContext._execute('lipo', [str(path) for path in lipo_input] + ['-create', f'-output {lipo_output}'])
+            BuildContext._copy_directory(src_dir=dsym_src, target_dir=lipo_dir / dsym)
+            dwarf = dsym.joinpath('Contents', 'Resources', 'DWARF', target)
+            lipo_input = [self.build_directory.joinpath(architecture.name, dwarf) for architecture in self.architectures]
+            return BuildContext._spawn(DarwinBuildContext._xcode_tool('lipo'),
+                                       [*map(str, lipo_input), '-create', '-output', str(lipo_dir / dwarf)])
+        return None
+
+    @staticmethod
+    @cache
+    def _xcode_tool(name: str) -> str:
+        """resolves the tool of the selected Xcode installation with `xcrun --find` once per process, so that it
+        doesn't have to be looked up again by xcrun or a `/usr/bin` shim on every call. Falls back to the name of the
+        tool, which is then looked up in PATH."""
+        try:
+            return subprocess.run(['xcrun', '--find', name], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return name
 
     @staticmethod
     def package(build_context_list: [BuildContext], darwin_target: str,
@@ -105,28 +118,41 @@ class DarwinBuildContext(BuildContext):
     @staticmethod
     def _create_xcframework(build_context_list: [BuildContext], target: str, target_dir: Path, build_directory: Path):
         print_prefixed(f'packaging to xcframework:')
-        output_dir: Path = build_directory / 'darwin' / 'package' / f'{target}.xcframework'
-        arguments = ['-create-xcframework', f'-output {output_dir}']
+        output_dir: Path = build_directory.joinpath('darwin', 'package', f'{target}.xcframework')
+        arguments = ['-create-xcframework', '-output', str(output_dir)]
         for build_context in build_context_list:
             if build_context.architectures is not None:
-                framework_base_path = build_context.build_directory / build_context.combined_architecture / target_dir / build_context.target_folder
+                framework_base_path = build_context.build_directory.joinpath(
+                    build_context.combined_architecture, target_dir, build_context.target_folder)
                 framework_path = framework_base_path / f"{target}.framework"
                 dsym_path = framework_base_path / f"{target}.framework.dSYM"
-                arguments.append(f'-framework {framework_path}')
+                arguments += ['-framework', str(framework_path)]
                 if dsym_path.exists():
                     print_prefixed(f'found debug symbols (dSYM). Including them into the xcframework.')
-                    arguments.append(f'-debug-symbols {dsym_path.resolve()}')
+                    arguments += ['-debug-symbols', str(dsym_path.resolve())]
         BuildContext._clean(output_dir)
-        BuildContext._execute('xcodebuild', arguments)
+        if BuildContext._execute(DarwinBuildContext._xcode_tool('xcodebuild'), arguments) != 0:
+            print_prefixed('creating the xcframework has failed', file=sys.stderr)
+            exit(2)
 
     @staticmethod
     def swiftpackage(swiftpackage_dir: Path, darwin_target: str,
-                     build_directory: Path):
+                     build_directory: Path, symlink_xcframework: bool = True):
+        """copies the swift package template and adds the xcframework to it. By default the xcframework is added as a
+        relative symlink to the packaged xcframework instead of a copy."""
         print_prefixed('creating swift package:')
 
         swiftpackage_target_dir = build_directory / 'darwin' / 'swiftpackage'
         xcframework_src_dir = build_directory / 'darwin' / 'package' / f'{darwin_target}.xcframework'
         xcframework_target_dir = swiftpackage_target_dir / 'bin' / f'{darwin_target}.xcframework'
 
-        BuildContext._copy_directory(swiftpackage_dir, swiftpackage_target_dir)
-        BuildContext._copy_directory(xcframework_src_dir, xcframework_target_dir)
+        BuildContext._sync_directory(swiftpackage_dir, swiftpackage_target_dir)
+        if symlink_xcframework:
+            print_prefixed(f"Link directory '{xcframework_src_dir}' to '{xcframework_target_dir}'")
+            BuildContext._clean(xcframework_target_dir)
+            xcframework_target_dir.parent.mkdir(parents=True, exist_ok=True)
+            xcframework_target_dir.symlink_to(os.path.relpath(xcframework_src_dir, xcframework_target_dir.parent),
+                                              target_is_directory=True)
+        else:
+            BuildContext._copy_directory(xcframework_src_dir, xcframework_target_dir,
+                                         copy_function=BuildContext._fast_copy)
@@ -3,9 +3,40 @@ from .android_build_context import AndroidBuildContext
 from .darwin_build_context import DarwinBuildContext
 from .windows_build_context import WindowsBuildContext
 from .linux_build_context import LinuxBuildContext
-from conans.client.conan_api import Conan
+from .build_context import BuildContext
 from pathlib import Path
+import multiprocessing
 import argparse
+import hashlib
+import json
+import time
+import os
+
+
+def _install_and_build(context: BuildContext, package: bool, create_conan_package: bool) -> float:
+    """runs all steps for one platform that do not depend on the results of other platforms and returns how long that
+    took in seconds. This is a module level function, so that it can be sent to a worker process."""
+    start = time.perf_counter()
+    context.install()
+    context.build()
+    if package:
+        context.package()
+    if create_conan_package:
+        context.conan_create_all()
+    return time.perf_counter() - start
+
+
+def _timing_key(context: BuildContext) -> str:
+    """identifies a platform build in the timings file"""
+    return f'{context.build_directory.name};{len(context.architectures)};{context.configuration.name}'
+
+
+def _load_timings(timings_file: Path) -> dict[str, float]:
+    """loads the durations of previous platform builds. Returns an empty dict if there are none or they can't be read."""
+    try:
+        return json.loads(timings_file.read_text())
+    except (OSError, ValueError):
+        return {}
 
 
 class DjinniBuild:
@@ -94,9 +125,27 @@ class DjinniBuild:
         self.default_build_dir = default_build_dir
         self.default_conan_build_profile = default_conan_build_profile
 
+    def cache_key(self, build_profile: str | Path) -> str:
+        """computes a key that identifies the state of the conan cache required for this project. It changes whenever
+        one of the conan profiles or the conanfile changes and can be used by CI systems to cache the conan data
+        directory."""
+        key = hashlib.blake2b(digest_size=16)
+        for profile in [self.android_profile, self.macos_profile, self.ios_profile, self.windows_profile,
+                        self.linux_profile, build_profile]:
+            profile_path = Path(profile)
+            key.update(profile_path.read_bytes() if profile_path.is_file() else str(profile).encode())
+        key.update((self.working_directory / 'conanfile.py').read_bytes())
+        return key.hexdigest()
+
     def main(self):
         """Main entrypoint. Parses the given CLI parameters & initializes the build contexts for the selected
         target platforms accordingly"""
+        if getattr(multiprocessing.current_process(), '_inheriting', False):
+            # a spawned worker process is still bootstrapping and imports the build script again as `__mp_main__`
+            # (multiprocessing uses the same flag to detect this). If the script calls `main()` without a
+            # `if __name__ == '__main__':` guard, the worker must not start another build. Builds started from any
+            # other process, including multiprocessing workers, run normally.
+            return
         parser = argparse.ArgumentParser(description='Build & package library for different platforms')
         parser.add_argument('--configuration', dest='configuration', type=BuildConfiguration.from_string,
                             choices=list(BuildConfiguration), default=BuildConfiguration.release)
@@ -126,10 +175,58 @@ class DjinniBuild:
                             choices=list(PackageType),
                             help='which packages to create. Packages that cannot be created for the selected target '
                                  'platforms will be ignored.')
+        parser.add_argument('--jobs', dest='jobs', type=int, default=1,
+                            help='maximum number of architectures that are built in parallel, across all target '
+                                 'platforms (Android, each Apple SDK, Windows, Linux). The jobs are split evenly '
+                                 'between the platforms that are built in parallel.')
+        parser.add_argument('--parallel-download', dest='parallel_download', type=int, nargs='?',
+                            const=os.cpu_count(),
+                            help='number of threads conan should use to download binary packages, one per CPU if no '
+                                 'number is given. Stored as `general.parallel_download` in the conan configuration.')
+        parser.add_argument('--download-cache', dest='download_cache', type=Path,
+                            help='directory in which conan caches downloaded files, shared by all architectures. '
+                                 'Stored as `storage.download_cache` in the conan configuration.')
+        parser.add_argument('--compiler-cache-dir', dest='compiler_cache_dir', type=Path,
+                            help='directory used by ccache/sccache to store the compiler cache.')
+        parser.add_argument('--artifact-cache', dest='artifact_cache', type=Path,
+                            help='directory in which the build folder of every architecture is cached after a '
+                                 'successful build, e.g. ~/.cache/djinni_build. If the sources are a clean git '
+                                 'checkout and the conan profiles & dependencies match a cached build, the build '
+                                 'folder is restored from the cache instead of building it again.')
+        parser.add_argument('--no-symlink', dest='symlink_xcframework', action='store_false',
+                            help='copy the xcframework into the swift package instead of linking to it. Use this if '
+                                 'the swift package is distributed without the build directory.')
+        parser.add_argument('--print-cache-key', dest='print_cache_key', action='store_true',
+                            help='print a key that identifies the conan dependencies of the project and exit. Can be '
+                                 'used by CI systems to cache the conan data directory.')
 
         arguments = parser.parse_args()
 
+        if arguments.print_cache_key:
+            print(f'conan-cache-key: {self.cache_key(arguments.conan_build_profile)}')
+            return
+
+        if arguments.compiler_cache_dir:
+            os.environ['CCACHE_DIR'] = str(arguments.compiler_cache_dir.absolute())
+            os.environ['SCCACHE_DIR'] = str(arguments.compiler_cache_dir.absolute())
+
+        arguments.build_directory.mkdir(parents=True, exist_ok=True)
+
+        from conans.client.conan_api import Conan
         conan = Conan()
+        # creates the conan configuration, default profile & settings if they don't exist yet, before multiple
+        # worker processes try to do it at the same time
+        conan.config_init()
+        if arguments.parallel_download:
+            conan.config_set('general.parallel_download', str(arguments.parallel_download))
+        if arguments.download_cache:
+            conan.config_set('storage.download_cache', str(arguments.download_cache.absolute()))
+
+        compiler_launcher = BuildContext.find_compiler_launcher()
+        artifact_cache = arguments.artifact_cache.expanduser().absolute() if arguments.artifact_cache else None
+        package_types = frozenset(arguments.package_types or ())
+        create_conan_package = PackageType.conan in package_types
+        platforms: list[tuple[BuildContext, bool]] = []
 
         if arguments.android_architectures:
             android = AndroidBuildContext(
@@ -145,82 +242,65 @@ class DjinniBuild:
                 conan_user=self.conan_user,
                 conan_channel=self.conan_channel,
                 android_module_name=self.android_module_name,
-                android_project_dir=self.android_project_dir)
-            android.install()
-            android.build()
-            if arguments.package_types and PackageType.aar in arguments.package_types:
-                android.package()
-            if arguments.package_types and PackageType.conan in arguments.package_types:
-                android.conan_create_all()
-
-        macos = DarwinBuildContext(
-            conan=conan,
-            working_directory=self.working_directory,
-            darwin_target=self.darwin_target,
-            darwin_target_dir=self.darwin_target_dir,
-            build_directory=arguments.build_directory/'darwin',
-            host_profile=self.macos_profile,
-            build_profile=arguments.conan_build_profile,
-            architectures=arguments.macos_architectures,
-            configuration=arguments.configuration,
-            conan_user=self.conan_user,
-            conan_channel=self.conan_channel,
-            sdk='macosx')
-        iphone = DarwinBuildContext(
-            conan=conan,
-            working_directory=self.working_directory,
-            darwin_target=self.darwin_target,
-            darwin_target_dir=self.darwin_target_dir,
-            build_directory=arguments.build_directory/'darwin',
-            host_profile=self.ios_profile,
-            build_profile=arguments.conan_build_profile,
-            architectures=arguments.iphoneos_architectures,
-            configuration=arguments.configuration,
-            conan_user=self.conan_user,
-            conan_channel=self.conan_channel,
-            sdk='iphoneos')
-        iphonesimulator = DarwinBuildContext(
-            conan=conan,
-            working_directory=self.working_directory,
-            darwin_target=self.darwin_target,
-            darwin_target_dir=self.darwin_target_dir,
-            build_directory=arguments.build_directory/'darwin',
-            host_profile=self.ios_profile,
-            build_profile=arguments.conan_build_profile,
-            architectures=arguments.iphonesimulator_architectures,
-            configuration=arguments.configuration,
-            conan_user=self.conan_user,
-            conan_channel=self.conan_channel,
-            sdk='iphonesimulator')
+                android_project_dir=self.android_project_dir,
+                jobs=arguments.jobs,
+                artifact_cache=artifact_cache,
+                compiler_launcher=compiler_launcher)
+            platforms.append((android, PackageType.aar in package_types))
+
+        darwin_contexts: list[DarwinBuildContext] = []
         if arguments.macos_architectures is not None:
-            macos.install()
-            macos.build()
-            if arguments.package_types and PackageType.conan in arguments.package_types:
-                macos.conan_create_all()
-        if arguments.iphonesimulator_architectures is not None:
-            iphonesimulator.install()
-            iphonesimulator.build()
-            if arguments.package_types and PackageType.conan in arguments.package_types:
-                iphonesimulator.conan_create_all()
+            darwin_contexts.append(DarwinBuildContext(
+                conan=conan,
+                working_directory=self.working_directory,
+                darwin_target=self.darwin_target,
+                darwin_target_dir=self.darwin_target_dir,
+                build_directory=arguments.build_directory/'darwin',
+                host_profile=self.macos_profile,
+                build_profile=arguments.conan_build_profile,
+                architectures=arguments.macos_architectures,
+                configuration=arguments.configuration,
+                conan_user=self.conan_user,
+                conan_channel=self.conan_channel,
+                jobs=arguments.jobs,
+                artifact_cache=artifact_cache,
+                compiler_launcher=compiler_launcher,
+                sdk='macosx'))
         if arguments.iphoneos_architectures is not None:
-            iphone.install()
-            iphone.build()
-            if arguments.package_types and PackageType.conan in arguments.package_types:
-                iphone.conan_create_all()
-
-        if arguments.package_types and PackageType.xcframework in arguments.package_types and (
-                        arguments.macos_architectures is not None or
-                        arguments.iphonesimulator_architectures is not None or
-                        arguments.iphoneos_architectures is not None):
-            DarwinBuildContext.package(build_context_list=[iphonesimulator, iphone, macos],
-                                       darwin_target=self.darwin_target,
-                                       darwin_target_dir=self.darwin_target_dir,
-                                       build_directory=arguments.build_directory)
-
-            if arguments.package_types and PackageType.swiftpackage in arguments.package_types:
-                DarwinBuildContext.swiftpackage(self.swiftpackage_dir,
-                                                darwin_target=self.darwin_target,
-                                                build_directory=arguments.build_directory)
+            darwin_contexts.append(DarwinBuildContext(
+                conan=conan,
+                working_directory=self.working_directory,
+                darwin_target=self.darwin_target,
+                darwin_target_dir=self.darwin_target_dir,
+                build_directory=arguments.build_directory/'darwin',
+                host_profile=self.ios_profile,
+                build_profile=arguments.conan_build_profile,
+                architectures=arguments.iphoneos_architectures,
+                configuration=arguments.configuration,
+                conan_user=self.conan_user,
+                conan_channel=self.conan_channel,
+                jobs=arguments.jobs,
+                artifact_cache=artifact_cache,
+                compiler_launcher=compiler_launcher,
+                sdk='iphoneos'))
+        if arguments.iphonesimulator_architectures is not None:
+            darwin_contexts.append(DarwinBuildContext(
+                conan=conan,
+                working_directory=self.working_directory,
+                darwin_target=self.darwin_target,
+                darwin_target_dir=self.darwin_target_dir,
+                build_directory=arguments.build_directory/'darwin',
+                host_profile=self.ios_profile,
+                build_profile=arguments.conan_build_profile,
+                architectures=arguments.iphonesimulator_architectures,
+                configuration=arguments.configuration,
+                conan_user=self.conan_user,
+                conan_channel=self.conan_channel,
+                jobs=arguments.jobs,
+                artifact_cache=artifact_cache,
+                compiler_launcher=compiler_launcher,
+                sdk='iphonesimulator'))
+        platforms += [(context, False) for context in darwin_contexts]
 
         if arguments.windows_architectures:
             windows = WindowsBuildContext(
@@ -236,13 +316,11 @@ class DjinniBuild:
                 conan_user=self.conan_user,
                 conan_channel=self.conan_channel,
                 nupkg_dir=self.nupkg_dir,
-                nupkg_name=self.nupkg_name)
-            windows.install()
-            windows.build()
-            if arguments.package_types and PackageType.nuget in arguments.package_types:
-                windows.package()
-            if arguments.package_types and PackageType.conan in arguments.package_types:
-                windows.conan_create_all()
+                nupkg_name=self.nupkg_name,
+                jobs=arguments.jobs,
+                artifact_cache=artifact_cache,
+                compiler_launcher=compiler_launcher)
+            platforms.append((windows, PackageType.nuget in package_types))
 
         if arguments.linux_architectures:
             linux = LinuxBuildContext(
@@ -254,9 +332,53 @@ class DjinniBuild:
                 architectures=arguments.linux_architectures,
                 configuration=arguments.configuration,
                 conan_user=self.conan_user,
-                conan_channel=self.conan_channel
+                conan_channel=self.conan_channel,
+                jobs=arguments.jobs,
+                artifact_cache=artifact_cache,
+                compiler_launcher=compiler_launcher
             )
-            linux.install()
-            linux.build()
-            if arguments.package_types and PackageType.conan in arguments.package_types:
-                linux.conan_create_all()
\ No newline at end of file
+            platforms.append((linux, False))
+
+        # start the platforms that took the longest last time first, so they don't end up waiting for a free worker
+        timings_file = arguments.build_directory / '.timings.json'
+        timings = _load_timings(timings_file)
+        platforms.sort(key=lambda platform: timings.get(_timing_key(platform[0]), 0.0), reverse=True)
+
+        if arguments.jobs > 1 and len(platforms) > 1:
+            # every platform gets an equal share of the jobs for its architectures, so that no more than `jobs` conan
+            # builds run at the same time
+            for context, _ in platforms:
+                context.jobs = max(1, arguments.jobs // len(platforms))
+            with BuildContext.process_pool(max_workers=min(arguments.jobs, len(platforms))) as executor:
+                futures = [executor.submit(_install_and_build, context, package, create_conan_package)
+                           for context, package in platforms]
+                for (context, _), future in zip(platforms, futures):
+                    if context in darwin_contexts:
+                        future.result()
+                self._package_darwin(darwin_contexts, package_types, arguments.build_directory,
+                                     arguments.symlink_xcframework)
+                durations = [future.result() for future in futures]
+        else:
+            durations = [_install_and_build(context, package, create_conan_package) for context, package in platforms]
+            self._package_darwin(darwin_contexts, package_types, arguments.build_directory,
+                                 arguments.symlink_xcframework)
+
+        if platforms:
+            timings.update({_timing_key(context): duration for (context, _), duration in zip(platforms, durations)})
+            timings_file.write_text(json.dumps(timings, indent=2))
+
+    def _package_darwin(self, darwin_contexts: list[DarwinBuildContext], package_types: frozenset[PackageType],
+                        build_directory: Path, symlink_xcframework: bool):
+        """combines the frameworks of all Apple SDKs that have been built into one xcframework and optionally a swift
+        package. Only requires the Apple SDKs to be finished, builds for other platforms can still be running."""
+        if PackageType.xcframework in package_types and darwin_contexts:
+            DarwinBuildContext.package(build_context_list=darwin_contexts,
+                                       darwin_target=self.darwin_target,
+                                       darwin_target_dir=self.darwin_target_dir,
+                                       build_directory=build_directory)
+
+            if PackageType.swiftpackage in package_types:
+                DarwinBuildContext.swiftpackage(self.swiftpackage_dir,
+                                                darwin_target=self.darwin_target,
+                                                build_directory=build_directory,
+                                                symlink_xcframework=symlink_xcframework)
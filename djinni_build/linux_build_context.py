@@ -3,9 +3,7 @@ from .build_context import BuildContext
 
 class LinuxBuildContext(BuildContext):
     def install(self):
-        for architecture in self.architectures:
-            self.conan_install(architecture=architecture)
+        self._for_each_arch(self.conan_install)
 
     def conan_create_all(self):
-        for architecture in self.architectures:
-            self.conan_create(architecture=architecture)
+        self._for_each_arch(self.conan_create)
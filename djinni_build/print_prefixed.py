@@ -1,7 +1,16 @@
+import threading
 import sys
 
 print_prefix = "[djinni-build.py]"
 
+_print_lock = threading.Lock()
 
-def print_prefixed(message: str, file=sys.stdout):
-    print(f'{print_prefix} {message}', file=file)
+
+def print_prefixed(*values, file=None):
+    """prints the values like `print`, prefixed with `print_prefix`. The whole line is written at once, so that lines
+    printed by builds running in parallel processes or threads don't get mixed up."""
+    file = file or sys.stdout
+    line = ' '.join(map(str, [print_prefix, *values])) + '\n'
+    with _print_lock:
+        file.write(line)
+        file.flush()
@@ -1,18 +1,22 @@
 from .build_context import BuildContext
 from .argparse_enums import Architecture, BuildConfiguration
 from .print_prefixed import print_prefixed
-from conans.client.conan_api import Conan
-import shutil
-from xml.dom import minidom
+from typing import TYPE_CHECKING
+import sys
+import os
+from xml.etree import ElementTree
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from conans.client.conan_api import Conan
+
 
 class WindowsBuildContext(BuildContext):
     """Build context for Windows (NET Core). This defines the logic for packaging the dlls for multiple architectures
     into one NuGet package for distribution."""
 
     def __init__(self,
-                 conan: Conan,
+                 conan: 'Conan',
                  working_directory: Path,
                  windows_target: str,
                  windows_target_dir: Path,
@@ -24,51 +28,72 @@ class WindowsBuildContext(BuildContext):
                  conan_user: str,
                  conan_channel: str,
                  nupkg_dir: Path,
-                 nupkg_name: str):
+                 nupkg_name: str,
+                 jobs: int = 1,
+                 artifact_cache: Path | None = None,
+                 compiler_launcher: str | None = None):
         super().__init__(conan, working_directory, build_directory, host_profile, build_profile, architectures,
-                         configuration, conan_user, conan_channel)
+                         configuration, conan_user, conan_channel, jobs=jobs,
+                         artifact_cache=artifact_cache, compiler_launcher=compiler_launcher)
         self.nupkg_dir = nupkg_dir
         self.nupkg_name = nupkg_name
         self.windows_target = windows_target
         self.windows_target_dir = windows_target_dir
         self.nupkg_net_version = self._extract_net_version()
         self.nupkg_target_dir = self.build_directory / 'package'
+        self.nupkg_ref_dir = self.nupkg_target_dir / 'ref' / self.nupkg_net_version
+        self.nupkg_runtimes_dir = self.nupkg_target_dir / 'runtimes'
 
     def install(self):
-        for architecture in self.architectures:
-            self.conan_install(architecture=architecture)
+        self._for_each_arch(self.conan_install)
 
     def conan_create_all(self):
-        for architecture in self.architectures:
-            self.conan_create(architecture=architecture)
+        self._for_each_arch(self.conan_create)
 
     def package(self):
         """Copies all dlls into the NuGet template in `lib/platform/windows` and runs `nuget pack`. The resulting
-        nupkg will be copied to the build output folder """
+        nupkg (and symbols package) will be copied into the build output folder """
         print_prefixed('packaging to NuGet package:')
         BuildContext._copy_directory(self.nupkg_dir, self.nupkg_target_dir)
         dll_filename = f'{self.windows_target}.dll'
         BuildContext._copy_file(
             src=self.build_directory / self.architectures[0].name / self.windows_target_dir / str(
                 self.configuration.value) / dll_filename,
-            dst=self.nupkg_target_dir / 'ref' / self.nupkg_net_version / dll_filename)
+            dst=self.nupkg_ref_dir / dll_filename)
 
-        pdb_found = False
-        for architecture in self.architectures:
-            destination = self.nupkg_target_dir / 'runtimes' / architecture.value.windows / 'lib' / self.nupkg_net_version
-            shutil.copytree(
-                src=self.build_directory / architecture.name / self.windows_target_dir / str(self.configuration.value),
-                dst=destination)
-            pdb_found = (destination / f'{self.windows_target}.pdb').exists()
+        # every architecture has to be copied, `any` must not stop at the first one that contains debug symbols
+        pdb_found = any([
+            WindowsBuildContext._copy_runtime_dir(
+                src=self.build_directory.joinpath(architecture.name, self.windows_target_dir, self.configuration.value),
+                dst=self.nupkg_runtimes_dir.joinpath(architecture.value.windows, 'lib', self.nupkg_net_version))
+            for architecture in self.architectures])
 
         nuget_arguments = ['pack', f'{self.nupkg_name}.nuspec']
         if pdb_found:
             nuget_arguments.append('-Symbols')
-        nuget_arguments.append(f'-Properties Configuration={self.configuration.value};version={self.version}')
-        BuildContext._execute('nuget', nuget_arguments, working_dir=self.nupkg_target_dir)
+        nuget_arguments += ['-Properties', f'Configuration={self.configuration.value};version={self.version}']
+        if BuildContext._execute('nuget', nuget_arguments, working_dir=self.nupkg_target_dir) != 0:
+            print_prefixed('creating the NuGet package has failed', file=sys.stderr)
+            exit(2)
+        for nupkg in self.nupkg_target_dir.glob('*.nupkg'):
+            BuildContext._copy_file(src=nupkg, dst=self.build_directory / nupkg.name, link=False)
+
+    @staticmethod
+    def _copy_runtime_dir(src: Path, dst: Path) -> bool:
+        """links all files of the runtime directory into the NuGet package, see `BuildContext._fast_copy`. Returns True
+        if the directory contains debug symbols (pdb files)."""
+        dst.mkdir(parents=True, exist_ok=True)
+        pdb_found = False
+        with os.scandir(src) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pdb_found |= WindowsBuildContext._copy_runtime_dir(Path(entry.path), dst / entry.name)
+                else:
+                    BuildContext._fast_copy(entry.path, dst / entry.name)
+                    pdb_found |= entry.name.endswith('.pdb')
+        return pdb_found
 
     def _extract_net_version(self):
         """reads the required net version from the given nuspec file"""
-        parser = minidom.parse(str(self.nupkg_dir / f'{self.nupkg_name}.nuspec'))
-        group = parser.getElementsByTagName('dependencies')[0].getElementsByTagName('group')[0]
-        return group.attributes['targetFramework'].value
+        nuspec = ElementTree.parse(self.nupkg_dir / f'{self.nupkg_name}.nuspec')
+        return nuspec.find('.//{*}dependencies/{*}group').get('targetFramework')
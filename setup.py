@@ -24,5 +24,5 @@ setup(name='djinni_build',
           'Programming Language :: Python :: 3.10'
       ],
       python_requires='>=3.10',
-      install_requires=['conan>=1.44'],
+      install_requires=['conan>=1.44,<2'],
       keywords='djinni')